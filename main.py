@@ -3,13 +3,103 @@
 import os
 import sys
 import logging
+import threading
+from datetime import timedelta
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from src.config import load_config
-from src.sync import sync_caldav_caldav, sync_caldav_busy, sync_caldav_full_oneway
+from src.sync import (
+    DEFAULT_HISTORY, sync_caldav_caldav, sync_caldav_busy, sync_caldav_full_oneway,
+)
 from src.caldav_client import CaldavClient
 from src.google_client import GoogleCalendarClient
 
+# Upper bound on mappings synced concurrently (the work is network-bound)
+MAX_WORKERS = 8
+
+# One lock per calendar pair so the same pair is never synced twice at once
+_pair_locks = {}
+_pair_locks_guard = threading.Lock()
+
+
+def _pair_lock(acct_src, cal_src, acct_tgt, cal_tgt) -> threading.Lock:
+    # Order-independent key: A→B and B→A touch the same calendars and state files
+    key = tuple(sorted([(acct_src, cal_src), (acct_tgt, cal_tgt)]))
+    with _pair_locks_guard:
+        return _pair_locks.setdefault(key, threading.Lock())
+
+
+def _mapping_history(mapping):
+    # `history_days: N` limits the sync to events ending in the last N days
+    # onwards; `all` (or null) syncs whole calendars, incrementally via sync-tokens
+    if 'history_days' not in mapping:
+        return DEFAULT_HISTORY
+    days = mapping['history_days']
+    if days is None or days == 'all':
+        return None
+    if isinstance(days, int) and not isinstance(days, bool) and days > 0:
+        return timedelta(days=days)
+    print(f"Invalid history_days '{days}' (expected a positive number or 'all')", file=sys.stderr)
+    sys.exit(1)
+
+
+def _mapping_label(mapping):
+    src = mapping.get('source') or {}
+    tgt = mapping.get('target') or {}
+    return f"{src.get('account')}:{src.get('calendar')} → {tgt.get('account')}:{tgt.get('calendar')}"
+
+
+def _run_mapping(mapping, clients, state_base):
+    src = mapping['source']
+    tgt = mapping['target']
+    mode = mapping.get('mode', 'full').lower()
+    history = _mapping_history(mapping)
+
+    acct_src, cal_src = src['account'], src['calendar']
+    acct_tgt, cal_tgt = tgt['account'], tgt['calendar']
+
+    if acct_src not in clients or acct_tgt not in clients:
+        print(f"Unknown account '{acct_src}' or '{acct_tgt}'", file=sys.stderr)
+        sys.exit(1)
+
+    client_src = clients[acct_src]
+    client_tgt = clients[acct_tgt]
+
+    with _pair_lock(acct_src, cal_src, acct_tgt, cal_tgt):
+        if mode == 'full':
+            state_file = state_base / f"{acct_src}__{cal_src}__{acct_tgt}__{cal_tgt}__full.json"
+            print(f"[Full-sync] {acct_src}:{cal_src} ↔ {acct_tgt}:{cal_tgt}")
+            sync_caldav_caldav(
+                client_src, cal_src,
+                client_tgt, cal_tgt,
+                state_path=str(state_file),
+                history=history,
+            )
+
+        elif mode == 'busy':
+            busy_state = state_base / f"{acct_src}__{cal_src}__{acct_tgt}__{cal_tgt}__busy.json"
+            full_state = state_base / f"{acct_tgt}__{cal_tgt}__{acct_src}__{cal_src}__full.json"
+            print(f"[Busy-sync] {acct_src}:{cal_src} → {acct_tgt}:{cal_tgt}")
+            sync_caldav_busy(
+                client_src, cal_src,
+                client_tgt, cal_tgt,
+                state_path=str(busy_state),
+                history=history,
+            )
+            print(f"[Full-sync One-way] {acct_tgt}:{cal_tgt} → {acct_src}:{cal_src}")
+            sync_caldav_full_oneway(
+                client_tgt, cal_tgt,
+                client_src, cal_src,
+                state_path=str(full_state),
+                history=history,
+            )
+
+        else:
+            print(f"Unsupported mode '{mode}'", file=sys.stderr)
+            sys.exit(1)
+
+
 def main():
     # Load configuration
     try:
@@ -47,49 +137,26 @@ def main():
         sys.exit(1)
 
     state_base = cfg['state_base']
-    for mapping in mappings:
-        src = mapping['source']
-        tgt = mapping['target']
-        mode = mapping.get('mode', 'full').lower()
-
-        acct_src, cal_src = src['account'], src['calendar']
-        acct_tgt, cal_tgt = tgt['account'], tgt['calendar']
-
-        if acct_src not in clients or acct_tgt not in clients:
-            print(f"Unknown account '{acct_src}' or '{acct_tgt}'", file=sys.stderr)
-            sys.exit(1)
-
-        client_src = clients[acct_src]
-        client_tgt = clients[acct_tgt]
-
-        if mode == 'full':
-            state_file = state_base / f"{acct_src}__{cal_src}__{acct_tgt}__{cal_tgt}__full.json"
-            print(f"[Full-sync] {acct_src}:{cal_src} ↔ {acct_tgt}:{cal_tgt}")
-            sync_caldav_caldav(
-                client_src, cal_src,
-                client_tgt, cal_tgt,
-                state_path=str(state_file),
-            )
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(mappings))) as pool:
+        futures = {
+            pool.submit(_run_mapping, mapping, clients, state_base): mapping
+            for mapping in mappings
+        }
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except BaseException as e:
+                errors.append(e)
+                # SystemExit already printed its reason; report everything
+                # else here so no failure but the first is lost
+                if not isinstance(e, SystemExit):
+                    print(f"[{_mapping_label(futures[fut])}] failed: {type(e).__name__}: {e}",
+                          file=sys.stderr)
 
-        elif mode == 'busy':
-            busy_state = state_base / f"{acct_src}__{cal_src}__{acct_tgt}__{cal_tgt}__busy.json"
-            full_state = state_base / f"{acct_tgt}__{cal_tgt}__{acct_src}__{cal_src}__full.json"
-            print(f"[Busy-sync] {acct_src}:{cal_src} → {acct_tgt}:{cal_tgt}")
-            sync_caldav_busy(
-                client_src, cal_src,
-                client_tgt, cal_tgt,
-                state_path=str(busy_state),
-            )
-            print(f"[Full-sync One-way] {acct_tgt}:{cal_tgt} → {acct_src}:{cal_src}")
-            sync_caldav_full_oneway(
-                client_tgt, cal_tgt,
-                client_src, cal_src,
-                state_path=str(full_state),
-            )
-
-        else:
-            print(f"Unsupported mode '{mode}'", file=sys.stderr)
-            sys.exit(1)
+    # Re-raise the first failure (incl. SystemExit) once every mapping has finished
+    if errors:
+        raise errors[0]
 
     print("✅ All sync operations completed.")
 
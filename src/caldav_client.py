@@ -1,6 +1,90 @@
 # src/caldav_client.py
 
+from datetime import datetime, timezone
+
+import requests
+from dateutil.relativedelta import relativedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from caldav import DAVClient as _DAVClient
+from caldav.elements.base import ValuedBaseElement
+from caldav.lib.error import NotFoundError, PropfindError, ReportError
+
+try:  # python-caldav 2.x+ talks HTTP through niquests instead of requests
+    import niquests
+    from niquests.adapters import HTTPAdapter as NiquestsHTTPAdapter, Retry as NiquestsRetry
+except ImportError:
+    niquests = None
+
+from .ical import EventMeta, as_utc, content_hash, dt_range_from_headers, event_meta, parse_dt_range
+
+
+# Keep-alive connections per server: concurrent mappings × both sides of a
+# mapping × concurrent per-event requests (8 × 2 × 8), as one account's
+# client can be shared by all of them
+POOL_SIZE = 128
+
+
+# RFC 4791 §9.6 partial retrieval: a time-range calendar-query returning only
+# the VEVENT properties needed to classify and place an event (+ VTIMEZONEs)
+_HEADERS_QUERY = """<?xml version="1.0" encoding="utf-8"?>
+<C:calendar-query xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">
+  <D:prop>
+    <D:getetag/>
+    <C:calendar-data>
+      <C:comp name="VCALENDAR">
+        <C:prop name="VERSION"/>
+        <C:comp name="VEVENT">
+          <C:prop name="UID"/>
+          <C:prop name="DTSTAMP"/>
+          <C:prop name="LAST-MODIFIED"/>
+          <C:prop name="SUMMARY"/>
+          <C:prop name="DTSTART"/>
+          <C:prop name="DTEND"/>
+          <C:prop name="DURATION"/>
+        </C:comp>
+        <C:comp name="VTIMEZONE"><C:allprop/><C:allcomp/></C:comp>
+      </C:comp>
+    </C:calendar-data>
+  </D:prop>
+  <C:filter>
+    <C:comp-filter name="VCALENDAR">
+      <C:comp-filter name="VEVENT">
+        <C:time-range start="{start}"/>
+      </C:comp-filter>
+    </C:comp-filter>
+  </C:filter>
+</C:calendar-query>"""
+
+
+# Full events in the time range whose LAST-MODIFIED is at or after `since`
+# (RFC 4791 §9.9 allows a time-range on DATE-TIME properties)
+_CHANGED_QUERY = """<?xml version="1.0" encoding="utf-8"?>
+<C:calendar-query xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">
+  <D:prop>
+    <D:getetag/>
+    <C:calendar-data/>
+  </D:prop>
+  <C:filter>
+    <C:comp-filter name="VCALENDAR">
+      <C:comp-filter name="VEVENT">
+        <C:time-range start="{start}"/>
+        <C:prop-filter name="LAST-MODIFIED">
+          <C:time-range start="{since}"/>
+        </C:prop-filter>
+      </C:comp-filter>
+    </C:comp-filter>
+  </C:filter>
+</C:calendar-query>"""
+
+
+def _utc_stamp(dt: datetime) -> str:
+    return as_utc(dt).strftime("%Y%m%dT%H%M%SZ")
+
+
+class _GetCtag(ValuedBaseElement):
+    # CalendarServer extension: changes whenever anything in the collection does
+    tag = "{http://calendarserver.org/ns/}getctag"
 
 
 class CaldavEvent:
@@ -8,11 +92,44 @@ class CaldavEvent:
     Lightweight wrapper around a python-caldav Event, exposing:
       - .url        → the event’s unique URL on the server
       - .to_ical()  → the raw iCalendar data (bytes or str)
+      - .ical       → to_ical() as bytes, memoized
+      - .meta       → EventMeta (uid, last_mod, summary), scanned once
+      - .dt_range   → (dtstart, dtend), parsed once
+      - .content_hash → digest ignoring DTSTAMP/LAST-MODIFIED/PRODID, once
     """
     def __init__(self, event):
         self._event = event
         # real caldav.Event has a .url attribute for its href :contentReference[oaicite:0]{index=0}
         self.url = getattr(event, 'url', None)
+        self._ical_bytes = None
+        self._meta = None
+        self._dt_range = None
+        self._content_hash = None
+
+    @property
+    def ical(self) -> bytes:
+        if self._ical_bytes is None:
+            raw = self.to_ical()
+            self._ical_bytes = raw.encode() if isinstance(raw, str) else raw
+        return self._ical_bytes
+
+    @property
+    def meta(self) -> EventMeta:
+        if self._meta is None:
+            self._meta = event_meta(self.ical)
+        return self._meta
+
+    @property
+    def dt_range(self):
+        if self._dt_range is None:
+            self._dt_range = parse_dt_range(self.ical, self.meta.headers)
+        return self._dt_range
+
+    @property
+    def content_hash(self) -> bytes:
+        if self._content_hash is None:
+            self._content_hash = content_hash(self.ical)
+        return self._content_hash
 
     def to_ical(self):
         """
@@ -24,8 +141,9 @@ class CaldavEvent:
             return self._event._raw
 
         # 2) The Event constructor stores initial data in .data :contentReference[oaicite:1]{index=1}
-        if hasattr(self._event, 'data') and self._event.data:
-            d = self._event.data
+        #    (read it once: on newer caldav .data is a property that may re-serialize)
+        d = getattr(self._event, 'data', None)
+        if d:
             # could be bytes or str
             return d if isinstance(d, (bytes, str)) else d.decode()
 
@@ -38,6 +156,36 @@ class CaldavEvent:
             raise AttributeError(f"Cannot extract iCal data: {e}")
 
 
+class LazyCaldavEvent(CaldavEvent):
+    """
+    Stand-in for an event known only by its URL (e.g. unchanged since the
+    last sync-token). `meta` can be supplied up front (from a cached index
+    or a partial fetch), and .dt_range is then taken from the `partial`
+    event or the scanned meta.headers when possible; the iCalendar data is
+    downloaded on first .to_ical().
+    """
+    def __init__(self, calendar, url, meta: EventMeta = None, partial: CaldavEvent = None):
+        super().__init__(None)
+        self._calendar = calendar
+        self.url = url
+        self._meta = meta
+        self._partial = partial
+
+    @property
+    def dt_range(self):
+        if self._dt_range is None:
+            if self._partial is not None:
+                self._dt_range = self._partial.dt_range
+            elif self._meta is not None and self._meta.headers:
+                self._dt_range = dt_range_from_headers(self._meta.headers)
+        return super().dt_range
+
+    def to_ical(self):
+        if self._event is None:
+            self._event = self._calendar.event_by_url(self.url)
+        return super().to_ical()
+
+
 class CaldavClient:
     """
     A simple CalDAV client wrapper supporting:
@@ -56,6 +204,35 @@ class CaldavClient:
         if principal_url:
             client_args["principal_url"] = principal_url
         self.client = _DAVClient(**client_args)
+        self._tune_session(self.client.session)
+
+    @staticmethod
+    def _tune_session(session) -> None:
+        """
+        Give the DAV session (requests, or niquests on newer python-caldav)
+        a connection pool large enough for concurrent syncs (no TCP/TLS
+        handshake per request) and retry transient 5xx.
+        """
+        if isinstance(session, requests.Session):
+            adapter_cls, retry_cls = HTTPAdapter, Retry
+        elif niquests is not None and isinstance(session, niquests.Session):
+            adapter_cls, retry_cls = NiquestsHTTPAdapter, NiquestsRetry
+        else:
+            return
+        retry = retry_cls(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=retry_cls.DEFAULT_ALLOWED_METHODS | {"PROPFIND", "REPORT"},
+            raise_on_status=False,  # let caldav turn the final response into its own error
+        )
+        adapter = adapter_cls(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, adapter)
+        if adapter_cls is HTTPAdapter:
+            # niquests keeps connections alive anyway, and may speak HTTP/2,
+            # where a Connection header is not allowed
+            session.headers["Connection"] = "keep-alive"
 
     def list_calendars(self) -> list[tuple[str, str]]:
         """
@@ -74,17 +251,135 @@ class CaldavClient:
                 return cal
         return None
 
-    def fetch_events(self, calendar, start: str = None, end: str = None) -> list:
+    def get_ctag(self, calendar) -> str | None:
+        """
+        :returns: The calendar's CalendarServer ctag, or None if the server
+        doesn't expose one.
         """
-        :returns: List of CaldavEvent wrappers for all events in the calendar.
-        If start/end are provided, does a date-based search; otherwise fetches all events.
+        try:
+            return calendar.get_property(_GetCtag())
+        except PropfindError:
+            return None
+
+    def fetch_events(self, calendar, start: datetime = None, end: datetime = None,
+                     sync_token: str = None,
+                     changed_since: datetime = None) -> tuple[list, list, str]:
+        """
+        :returns: (events, deleted_hrefs, new_sync_token); events is an
+        iterable, which for a full listing via sync-token is streamed in
+        batches (see iter_events_by_href).
+        If start/end are provided, does a server-side time-range search
+        (recurring events unexpanded, never a sync-token); with
+        `changed_since` as well, only events whose LAST-MODIFIED (or DTSTAMP)
+        is later are returned, filtered server-side where supported and
+        client-side otherwise. Otherwise uses
+        the RFC 6578 sync-collection REPORT: with no sync_token every event
+        is returned, with a sync_token only events changed since then plus
+        the hrefs of deleted ones.
+        new_sync_token is None when the server doesn't support sync-tokens
+        (or rejected the given one); the events are then a full listing.
         """
         # use the unified .search() API rather than the deprecated .date_search()
+        if start and changed_since and not end:
+            query = _CHANGED_QUERY.format(start=_utc_stamp(start), since=_utc_stamp(changed_since))
+            try:
+                raw = calendar.search(xml=query)
+            except ReportError:
+                raw = calendar.search(start=start, event=True, expand=False)
+            # servers may ignore the prop-filter (or match on >=)
+            since = as_utc(changed_since)
+            events = [CaldavEvent(evt) for evt in raw]
+            return [e for e in events if as_utc(e.meta.last_mod) > since], [], None
+
         if start or end:
-            raw = calendar.search(start=start, end=end)
-        else:
-            raw = calendar.search()
-        return [CaldavEvent(evt) for evt in raw]
+            raw = calendar.search(start=start, end=end, event=True, expand=False)
+            return [CaldavEvent(evt) for evt in raw], [], None
+
+        try:
+            # initial run only needs the token and the hrefs; the batched
+            # multiget below is much cheaper than loading every object one by one
+            coll = calendar.objects_by_sync_token(
+                sync_token=sync_token, load_objects=sync_token is not None
+            )
+        except ReportError:
+            return [CaldavEvent(evt) for evt in calendar.search()], [], None
+
+        # newer python-caldav emulates tokens with a full listing ("fake-…")
+        if isinstance(coll.sync_token, str) and coll.sync_token.startswith("fake-"):
+            return [CaldavEvent(obj) for obj in coll.objects], [], None
+
+        if sync_token is None:
+            hrefs = [obj.url for obj in coll.objects]
+            return self.iter_events_by_href(calendar, hrefs), [], coll.sync_token
+
+        # objects that failed to load (404) were deleted since the last token
+        changed = [CaldavEvent(obj) for obj in coll.objects if obj.data]
+        deleted = [str(obj.url) for obj in coll.objects if not obj.data]
+        return changed, deleted, coll.sync_token
+
+    def iter_events(self, calendar, start: datetime, chunk_months: int = 6,
+                    horizon_months: int = 24):
+        """
+        Like fetch_events(calendar, start=start), but walks the range in
+        `chunk_months`-sized time-range searches up to `horizon_months` from
+        now (then one open-ended search for anything later) and yields
+        CaldavEvent one at a time, so no single REPORT response has to hold
+        the whole calendar.
+        Events overlapping several windows (long or recurring ones) are
+        yielded once per window; key them by .url to deduplicate.
+        """
+        step = relativedelta(months=chunk_months)
+        horizon = datetime.now(timezone.utc) + relativedelta(months=horizon_months)
+        win_start = start
+        while True:
+            win_end = win_start + step if win_start < horizon else None
+            for evt in calendar.search(start=win_start, end=win_end, event=True, expand=False):
+                yield CaldavEvent(evt)
+            if win_end is None:
+                return
+            win_start = win_end
+
+    def iter_events_by_href(self, calendar, hrefs, batch_size: int = 100):
+        """
+        Download the events at `hrefs` with calendar-multiget REPORTs of
+        `batch_size` events each, yielding CaldavEvent one at a time.
+        Hrefs that no longer exist are skipped.
+        """
+        hrefs = list(hrefs)
+        for i in range(0, len(hrefs), batch_size):
+            for obj in calendar.multiget(hrefs[i:i + batch_size]):
+                yield CaldavEvent(obj)
+
+    def fetch_event_headers(self, calendar, start: datetime) -> list:
+        """
+        Like fetch_events(calendar, start=start), but the server only sends
+        UID, DTSTAMP/LAST-MODIFIED, SUMMARY and DTSTART/DTEND/DURATION of
+        each event.
+        :returns: List of LazyCaldavEvent with .meta filled in; .dt_range is
+        parsed from the partial data on first use, and the full iCalendar
+        data is only downloaded if .ical is needed.
+        Falls back to a regular fetch if the server rejects the query.
+        """
+        query = _HEADERS_QUERY.format(start=_utc_stamp(start))
+        try:
+            raw = calendar.search(xml=query)
+        except ReportError:
+            return self.fetch_events(calendar, start=start)[0]
+        events = []
+        for obj in raw:
+            partial = CaldavEvent(obj)
+            events.append(LazyCaldavEvent(calendar, str(obj.url), partial.meta, partial))
+        return events
+
+    def get_event_by_uid(self, calendar, uid: str) -> CaldavEvent | None:
+        """
+        :returns: The wrapped event with this UID, wherever it lies in time,
+        or None if the calendar has none.
+        """
+        try:
+            return CaldavEvent(calendar.object_by_uid(uid))
+        except NotFoundError:
+            return None
 
     def create_event(self, calendar, ical: str) -> None:
         """
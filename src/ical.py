@@ -0,0 +1,286 @@
+# src/ical.py
+
+"""
+iCalendar helpers shared by the CalDAV client and the sync code.
+
+Everything the sync needs from an event (UID, timestamps, SUMMARY, start/end)
+is pulled out with a cheap regex scan of the first VEVENT; icalendar is
+only used as a fallback for values the scan can't interpret.
+"""
+
+import re
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from icalendar import Calendar as ICalendar
+from icalendar.prop import vDuration
+
+_VEVENT_RE = re.compile(rb"^BEGIN:VEVENT\r?\n(.*?)^END:VEVENT", re.M | re.S)
+_VTIMEZONE_RE = re.compile(rb"^BEGIN:VTIMEZONE\r?\n.*?^END:VTIMEZONE", re.M | re.S)
+_UNFOLD_RE = re.compile(rb"\r?\n[ \t]")
+_HEADER_RE = re.compile(rb"(UID|LAST-MODIFIED|DTSTAMP|SUMMARY|DTSTART|DTEND|DURATION)((?:;[^:]*)?):(.*)")
+_TEXT_ESCAPE_RE = re.compile(r"\\([\\;,nN])")
+_DTRANGE_RE = re.compile(rb"^(DTSTART|DTEND)((?:;[^:\r\n]*)?):([^\r\n]+)", re.M)
+# properties that change on every write/round-trip without the event changing
+_VOLATILE_RE = re.compile(rb"(?:DTSTAMP|LAST-MODIFIED|PRODID)[;:]")
+
+
+def scan_ical_headers(raw) -> dict:
+    """
+    Scan the first VEVENT for UID, LAST-MODIFIED, DTSTAMP, SUMMARY, DTSTART,
+    DTEND and DURATION without a full parse. Folded lines are unfolded and properties of
+    nested components (e.g. VALARM) are ignored.
+    Returns {NAME: (params, value)} as str, or {} if there is no VEVENT.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    m = _VEVENT_RE.search(raw)
+    if not m:
+        return {}
+    headers = {}
+    depth = 0
+    for line in _UNFOLD_RE.sub(b"", m.group(1)).splitlines():
+        if line.startswith(b"BEGIN:"):
+            depth += 1
+        elif line.startswith(b"END:"):
+            depth -= 1
+        elif depth == 0:
+            hm = _HEADER_RE.match(line)
+            if hm:
+                name = hm.group(1).decode()
+                if name not in headers:
+                    headers[name] = (hm.group(2).decode("utf-8", "replace"),
+                                     hm.group(3).decode("utf-8", "replace"))
+    return headers
+
+
+def header_dt(headers: dict, name: str):
+    """
+    Fast-path DATE-TIME parse of a scanned header: UTC ("...Z") and floating
+    values only. Returns None when the slow path is needed (TZID, VALUE=DATE, …).
+    """
+    params, value = headers.get(name, (None, None))
+    if params != "":
+        return None
+    try:
+        if value.endswith("Z"):
+            return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return datetime.strptime(value, "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None
+
+
+def _first_vevent_calendar(raw) -> bytes:
+    """
+    A minimal VCALENDAR holding just the first VEVENT of `raw` and its
+    VTIMEZONEs (for TZID lookups), so the slow paths don't parse every
+    other component. Returns `raw` as is if it has no VEVENT.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    m = _VEVENT_RE.search(raw)
+    if not m:
+        return raw
+    parts = [b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//x//\r\n"]
+    parts += [tz.group(0) + b"\r\n" for tz in _VTIMEZONE_RE.finditer(raw)]
+    parts += [m.group(0), b"\r\nEND:VCALENDAR\r\n"]
+    return b"".join(parts)
+
+
+def as_utc(dt: datetime) -> datetime:
+    """`dt` as an aware UTC datetime; floating (naive) values are taken as UTC."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def parse_ical_metadata(ical_bytes, headers: dict = None):
+    """
+    Parse out the UID and a `datetime` for LAST-MODIFIED (or DTSTAMP if no LAST-MODIFIED).
+    Returns (uid: str, last_mod: datetime).
+    """
+    if headers is None:
+        headers = scan_ical_headers(ical_bytes)
+    if "UID" in headers:
+        lm_name = "LAST-MODIFIED" if "LAST-MODIFIED" in headers else "DTSTAMP"
+        last_mod = header_dt(headers, lm_name)
+        if last_mod is not None:
+            return headers["UID"][1], last_mod
+    return parse_ical_metadata_full(ical_bytes)
+
+
+def parse_ical_metadata_full(ical_bytes):
+    """Slow path of parse_ical_metadata, via an icalendar parse of the first VEVENT."""
+    cal = ICalendar.from_ical(_first_vevent_calendar(ical_bytes))
+    for comp in cal.walk():
+        if comp.name == "VEVENT":
+            uid = str(comp.get("UID"))
+            lm = comp.get("LAST-MODIFIED") or comp.get("DTSTAMP")
+            last_mod = lm.dt if hasattr(lm, "dt") else lm
+            if not isinstance(last_mod, datetime):
+                raise ValueError(f"Could not parse timestamp for UID={uid}")
+            return uid, last_mod
+    raise ValueError("No VEVENT found in ical data")
+
+
+def _default_end(dtstart):
+    # RFC 5545 §3.6.1: without DTEND/DURATION an all-day event lasts one day,
+    # a timed one ends when it starts
+    if isinstance(dtstart, datetime):
+        return dtstart
+    return dtstart + timedelta(days=1)
+
+
+def dt_range_from_headers(headers: dict):
+    """
+    Fast path of parse_dt_range on scanned headers only.
+    Returns None when the slow path is needed (TZID, VALUE=DATE, …).
+    """
+    dtstart = header_dt(headers, "DTSTART")
+    if dtstart is None:
+        return None
+    if "DTEND" in headers:
+        dtend = header_dt(headers, "DTEND")
+        return (dtstart, dtend) if dtend is not None else None
+    if "DURATION" in headers:
+        try:
+            return dtstart, dtstart + vDuration.from_ical(headers["DURATION"][1])
+        except ValueError:
+            return None
+    return dtstart, _default_end(dtstart)
+
+
+def parse_dt_range(ical_bytes, headers: dict = None):
+    """
+    Returns (dtstart, dtend) of the first VEVENT; without a DTEND the end is
+    derived from DURATION (or the RFC 5545 default).
+    """
+    if headers is None:
+        headers = scan_ical_headers(ical_bytes)
+    dt_range = dt_range_from_headers(headers)
+    if dt_range is not None:
+        return dt_range
+    return parse_dt_range_full(ical_bytes)
+
+
+def parse_dt_range_full(ical_bytes):
+    cal = ICalendar.from_ical(_first_vevent_calendar(ical_bytes))
+    for comp in cal.walk():
+        if comp.name == "VEVENT":
+            dtstart = comp.get("DTSTART").dt
+            if "DTEND" in comp:
+                return dtstart, comp["DTEND"].dt
+            if "DURATION" in comp:
+                return dtstart, dtstart + comp["DURATION"].dt
+            return dtstart, _default_end(dtstart)
+    raise ValueError("No VEVENT for dt parsing")
+
+
+def get_summary(raw_ical: bytes, headers: dict = None) -> str:
+    """
+    Returns the unescaped SUMMARY of the first VEVENT (None if it has none).
+    """
+    if headers is None:
+        headers = scan_ical_headers(raw_ical)
+    if not headers:
+        return ""
+    if "SUMMARY" not in headers:
+        return None
+    return _TEXT_ESCAPE_RE.sub(
+        lambda m: "\n" if m.group(1) in "nN" else m.group(1), headers["SUMMARY"][1]
+    )
+
+
+def content_hash(raw) -> bytes:
+    """
+    Digest of the iCalendar data with DTSTAMP, LAST-MODIFIED and PRODID
+    dropped (and line folding/endings normalized), so two copies of the same
+    event hash equal even if their timestamps differ.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    lines = [line.rstrip() for line in _UNFOLD_RE.sub(b"", raw).splitlines()
+             if not _VOLATILE_RE.match(line)]
+    return hashlib.blake2b(b"\n".join(lines), digest_size=16).digest()
+
+
+class EventMeta(NamedTuple):
+    uid: str
+    last_mod: datetime
+    summary: str
+    headers: dict  # scan_ical_headers() result, or None if not scanned
+
+
+def event_meta(raw) -> EventMeta:
+    """
+    Scan an event once and return its EventMeta.
+    """
+    headers = scan_ical_headers(raw)
+    uid, last_mod = parse_ical_metadata(raw, headers)
+    return EventMeta(uid, last_mod, get_summary(raw, headers), headers)
+
+
+def _format_dt(params: str, value) -> str | None:
+    """
+    Format `value` for a DTSTART/DTEND line carrying `params` (";TZID=…").
+    Returns None if it can't be expressed with those params.
+    """
+    ps = dict(p.split("=", 1) for p in params.split(";")[1:] if "=" in p)
+    ps = {k.upper(): v.strip('"') for k, v in ps.items()}
+    if ps.get("VALUE", "DATE-TIME").upper() == "DATE":
+        if isinstance(value, datetime) or not isinstance(value, date):
+            return None
+        return value.strftime("%Y%m%d")
+    if not isinstance(value, datetime):
+        return None
+    if "TZID" in ps:
+        if value.tzinfo is None:
+            return None
+        try:
+            tz = ZoneInfo(ps["TZID"])
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+        return value.astimezone(tz).strftime("%Y%m%dT%H%M%S")
+    if value.tzinfo is None:
+        return value.strftime("%Y%m%dT%H%M%S")
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def rewrite_dt_range(raw, new_start, new_end) -> bytes | None:
+    """
+    Replace DTSTART/DTEND of every VEVENT in place, keeping their parameters
+    and every other byte untouched. Returns None if that isn't possible
+    (a VEVENT without plain DTSTART and DTEND lines, e.g. one using DURATION,
+    a DTSTART/DTEND folded onto several lines, unknown TZID, DATE vs
+    DATE-TIME mismatch, …) and a full re-serialization is needed instead.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    new_values = {b"DTSTART": new_start, b"DTEND": new_end}
+
+    def _sub(m):
+        if _UNFOLD_RE.match(m.string, m.end()):
+            # the value continues on a folded line we would leave behind
+            raise ValueError("cannot rewrite in place")
+        value = _format_dt(m.group(2).decode("utf-8", "replace"), new_values[m.group(1)])
+        if value is None:
+            raise ValueError("cannot rewrite in place")
+        return m.group(1) + m.group(2) + b":" + value.encode()
+
+    out = []
+    pos = 0
+    for vm in _VEVENT_RE.finditer(raw):
+        block = raw[vm.start(1):vm.end(1)]
+        if {m.group(1) for m in _DTRANGE_RE.finditer(block)} != {b"DTSTART", b"DTEND"}:
+            return None
+        try:
+            block = _DTRANGE_RE.sub(_sub, block)
+        except ValueError:
+            return None
+        out += [raw[pos:vm.start(1)], block]
+        pos = vm.end(1)
+    if not out:
+        return None
+    out.append(raw[pos:])
+    return b"".join(out)
@@ -0,0 +1,41 @@
+# src/state.py
+
+import os
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: several times faster on large state files
+    orjson = None
+
+
+def load_state(path: str) -> dict:
+    """
+    Load a JSON state file.
+    :returns: The stored object, or {} if the file doesn't exist yet.
+    """
+    if not os.path.exists(path):
+        return {}
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_state(path: str, obj) -> None:
+    """
+    Atomically replace the state file at `path` with `obj`.
+    The data goes to `path + ".tmp"` first, so a crash mid-write can never
+    leave a truncated state file behind. State files are only read by this
+    program, so they're written compactly.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        if orjson is not None:
+            f.write(orjson.dumps(obj))
+        else:
+            f.write(json.dumps(obj, separators=(",", ":")).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -1,32 +1,218 @@
 # src/sync.py
 
 import os
-import json
 import logging
-from datetime import datetime, timezone
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from icalendar import Calendar as ICalendar, Event
 from caldav.lib.error import PutError
 
-from .caldav_client import CaldavClient, CaldavEvent
+from .caldav_client import CaldavClient, CaldavEvent, LazyCaldavEvent
+from .ical import EventMeta, as_utc, rewrite_dt_range
+from .state import load_state, save_state
 
 logger = logging.getLogger(__name__)
 
+# How far back the sync looks by default; older events are left alone
+DEFAULT_HISTORY = timedelta(days=30)
 
-def _parse_ical_metadata(ical_bytes):
+# Upper bound on concurrent per-event requests (PUT/DELETE/UID lookups) within one sync
+MAX_WRITE_WORKERS = 8
+
+
+def _run_both(call_a, call_b):
     """
-    Parse out the UID and a `datetime` for LAST-MODIFIED (or DTSTAMP if no LAST-MODIFIED).
-    Returns (uid: str, last_mod: datetime).
+    Run two independent zero-argument callables concurrently (typically one
+    request per server) and return (result_a, result_b).
     """
-    cal = ICalendar.from_ical(ical_bytes)
-    for comp in cal.walk():
-        if comp.name == "VEVENT":
-            uid = str(comp.get("UID"))
-            lm = comp.get("LAST-MODIFIED") or comp.get("DTSTAMP")
-            last_mod = lm.dt if hasattr(lm, "dt") else lm
-            if not isinstance(last_mod, datetime):
-                raise ValueError(f"Could not parse timestamp for UID={uid}")
-            return uid, last_mod
-    raise ValueError("No VEVENT found in ical data")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fut_a = pool.submit(call_a)
+        fut_b = pool.submit(call_b)
+        return fut_a.result(), fut_b.result()
+
+
+def _fetch_ctags(client_a: CaldavClient, cal_a, client_b: CaldavClient, cal_b,
+                 sync_a: dict, sync_b: dict):
+    """
+    Read both calendars' ctags. Returns (ctag_a, ctag_b, unchanged) where
+    `unchanged` is True iff both match the ctags persisted in sync_a/sync_b,
+    i.e. nothing on either side changed since the last run.
+    """
+    ctag_a, ctag_b = _run_both(
+        lambda: client_a.get_ctag(cal_a),
+        lambda: client_b.get_ctag(cal_b),
+    )
+    unchanged = (
+        ctag_a is not None and ctag_b is not None
+        and ctag_a == sync_a.get("ctag") and ctag_b == sync_b.get("ctag")
+    )
+    return ctag_a, ctag_b, unchanged
+
+
+def _run_writes(*batches) -> dict:
+    """
+    Run batches of (uid, call) write operations: batches one after another,
+    the calls within a batch concurrently.
+    Returns {uid: exception} for the calls that failed.
+    """
+    failed = {}
+    with ThreadPoolExecutor(max_workers=MAX_WRITE_WORKERS) as pool:
+        for batch in batches:
+            futures = {pool.submit(call): uid for uid, call in batch}
+            for fut, uid in futures.items():
+                exc = fut.exception()
+                if exc is not None:
+                    logger.error(f"UID={uid} write failed: {exc}")
+                    failed[uid] = exc
+    return failed
+
+
+def _confirm_missing(client: CaldavClient, calendar, uids, time_min: datetime = None) -> dict:
+    """
+    In time-window mode a UID missing from one side's window isn't
+    necessarily deleted there: that copy may have been moved before the
+    window, or be a recurring series whose first occurrence lies before it.
+    Look each of `uids` up on `calendar`; returns {uid: event} for those that
+    still exist. Without a window the listing is complete, so nothing is
+    looked up.
+    """
+    uids = list(uids)
+    if time_min is None or not uids:
+        return {}
+    with ThreadPoolExecutor(max_workers=MAX_WRITE_WORKERS) as pool:
+        found = pool.map(lambda uid: client.get_event_by_uid(calendar, uid), uids)
+        return {uid: e for uid, e in zip(uids, found) if e is not None}
+
+
+def _create_or_update(client: CaldavClient, calendar, uid: str, ical, existing=None) -> None:
+    """
+    Create an event; if the calendar already holds its UID (PutError), e.g.
+    a copy outside the sync window, overwrite that copy instead. `existing`
+    is that copy if already known, otherwise it's looked up by UID.
+    """
+    try:
+        client.create_event(calendar, ical)
+    except PutError:
+        existing = existing or client.get_event_by_uid(calendar, uid)
+        if existing is None:
+            raise
+        client.update_event(calendar, existing.url, ical)
+
+
+def _copy_event(client: CaldavClient, calendar, uid: str, event, target=None) -> None:
+    """
+    Write `event` onto `calendar`: over `target`, its older copy there, or
+    as a new event (see _create_or_update). A `target` identical apart from
+    DTSTAMP/LAST-MODIFIED/PRODID (e.g. restamped by its server after a
+    round-trip) is left alone. Meant to run in a write worker: the data of
+    an event known only by its metadata is downloaded there, concurrently,
+    not while the writes are being planned.
+    """
+    if target is None:
+        _create_or_update(client, calendar, uid, event.ical)
+    elif event.content_hash != target.content_hash:
+        client.update_event(calendar, target.url, event.ical)
+    else:
+        logger.debug(f"UID={uid} same content, only the timestamps differ")
+
+
+def _meta_only(calendar, events):
+    """
+    Reduce streamed events to their metadata (a LazyCaldavEvent) as they
+    arrive, so a calendar's full data never sits in memory at once.
+    """
+    for e in events:
+        yield LazyCaldavEvent(calendar, str(e.url), e.meta)
+
+
+def _since(history: timedelta | None):
+    """Start of the sync window for `history`, or None for all of it."""
+    return datetime.now(timezone.utc) - history if history is not None else None
+
+
+def _fetch_side(client: CaldavClient, calendar, side_state: dict, time_min: datetime = None,
+                headers_only: bool = False):
+    """
+    Fetch one calendar incrementally using the sync-token and href index
+    persisted from the previous run:
+      side_state = {"token": str, "index": {href: [uid, last_mod, summary]}, "ctag": str,
+                    "max_last_mod": str}
+    Unchanged events are rebuilt from the index (as LazyCaldavEvent) so they
+    are neither downloaded nor parsed.
+    With `time_min`, does a time-range search instead: sync-collection can't
+    filter by time, and both sides must see the same window or events
+    outside it would look deleted; the search is done in chunks (see
+    iter_events) and only metadata is kept, so memory stays bounded by one
+    chunk; the same goes for a full listing via sync-token. Later runs only download events modified after the newest
+    LAST-MODIFIED seen before ("max_last_mod"); the rest of the window is
+    listed with fetch_event_headers and fetched on demand.
+    `headers_only` instead always asks the server for just
+    UID/timestamps/SUMMARY/DTSTART/DTEND/DURATION (see fetch_event_headers).
+    Returns (entries, new_side_state); entries maps href → event.
+    """
+    if time_min is not None:
+        index = token = None
+        if headers_only:
+            events, deleted, new_token = client.fetch_event_headers(calendar, time_min), [], None
+        elif side_state.get("max_last_mod"):
+            # list the window cheaply and bulk-download only what changed
+            # since the last run; anything else is downloaded if needed
+            since = datetime.fromisoformat(side_state["max_last_mod"])
+            listing, (changed, _, _) = _run_both(
+                lambda: client.fetch_event_headers(calendar, time_min),
+                lambda: client.fetch_events(calendar, start=time_min, changed_since=since),
+            )
+            events, deleted, new_token = listing + changed, [], None
+        else:
+            # streamed window by window; the data of the events that get
+            # written is downloaded again by the write workers
+            events = _meta_only(calendar, client.iter_events(calendar, time_min))
+            deleted, new_token = [], None
+    else:
+        index = side_state.get("index")
+        token = side_state.get("token") if index is not None else None
+        events, deleted, new_token = client.fetch_events(calendar, sync_token=token)
+        if token is None or new_token is None:
+            # a full listing (streamed in batches): keep only the metadata
+            events = _meta_only(calendar, events)
+
+    entries = {}
+    if token is not None and new_token is not None:
+        deleted = set(deleted)
+        for href, (uid, lm, summary) in index.items():
+            if href not in deleted:
+                meta = EventMeta(uid, datetime.fromisoformat(lm), summary, None)
+                entries[href] = LazyCaldavEvent(calendar, href, meta)
+
+    for e in events:
+        entries[str(e.url)] = e
+
+    # the index is only worth keeping alongside a token
+    new_side_state = {
+        "token": new_token,
+        "index": {href: [e.meta.uid, e.meta.last_mod.isoformat(), e.meta.summary]
+                  for href, e in entries.items()} if new_token is not None else None,
+    }
+    if time_min is not None and not headers_only and entries:
+        new_side_state["max_last_mod"] = max(
+            (e.meta.last_mod for e in entries.values()), key=as_utc
+        ).isoformat()
+    return entries, new_side_state
+
+
+def _build_meta(events, skip_busy: bool = False) -> dict:
+    """
+    Index fetched events by UID: {uid: (last_mod, event)}.
+    With `skip_busy`, Busy placeholders (SUMMARY "Busy") are left out.
+    """
+    meta = {}
+    for e in events:
+        m = e.meta
+        if skip_busy and m.summary == "Busy":
+            continue
+        meta[m.uid] = (m.last_mod, e)
+    return meta
 
 
 def sync_caldav_caldav(
@@ -35,47 +221,60 @@ def sync_caldav_caldav(
     client_b: CaldavClient,
     cal_name_b: str,
     state_path: str = "sync_state.json",
+    history: timedelta | None = DEFAULT_HISTORY,
 ):
     """
     Two-way sync between two CalDAV calendars.
     - Creates new events on the other side.
     - Updates older copies based on LAST-MODIFIED/DTSTAMP.
     - Deletes events if they were removed on one side since last sync.
+    Only events overlapping the last `history` onwards are considered;
+    history=None syncs everything (incrementally, via sync-tokens).
     """
+    time_min = _since(history)
 
     # 1) Load previous state if present
-    if os.path.exists(state_path):
-        with open(state_path, "r") as f:
-            old_state = json.load(f)
-            old_state = {
-                uid: datetime.fromisoformat(ts) for uid, ts in old_state.items()
-            }
-    else:
-        old_state = {}
+    #    (timestamps stay ISO strings: they're only tested for presence or equality)
+    old_state = load_state(state_path)
+    sync_a = old_state.pop("__sync_a", {})
+    sync_b = old_state.pop("__sync_b", {})
 
     # 2) Look up the calendars
-    cal_a = client_a.get_calendar_by_name(cal_name_a)
-    cal_b = client_b.get_calendar_by_name(cal_name_b)
+    cal_a, cal_b = _run_both(
+        lambda: client_a.get_calendar_by_name(cal_name_a),
+        lambda: client_b.get_calendar_by_name(cal_name_b),
+    )
     if not cal_a or not cal_b:
         raise ValueError(f"One of the calendars not found: {cal_name_a}, {cal_name_b}")
 
-    # 3) Fetch events
-    evts_a = client_a.fetch_events(cal_a)
-    evts_b = client_b.fetch_events(cal_b)
-
-    meta_a = { }
-    for e in evts_a:
-        uid, lm = _parse_ical_metadata(e.to_ical())
-        meta_a[uid] = (lm, e)
-
-    meta_b = { }
-    for e in evts_b:
-        uid, lm = _parse_ical_metadata(e.to_ical())
-        meta_b[uid] = (lm, e)
-
-    # 4) Reconcile
+    # 3) Fetch events (incrementally, via sync-token), unless neither ctag moved
+    ctag_a, ctag_b, unchanged = _fetch_ctags(client_a, cal_a, client_b, cal_b, sync_a, sync_b)
+    if unchanged:
+        logger.info("Full two‐way sync: no changes (ctag)")
+        return
+    (evts_a, sync_a), (evts_b, sync_b) = _run_both(
+        lambda: _fetch_side(client_a, cal_a, sync_a, time_min),
+        lambda: _fetch_side(client_b, cal_b, sync_b, time_min),
+    )
+    sync_a["ctag"], sync_b["ctag"] = ctag_a, ctag_b
+
+    meta_a = _build_meta(evts_a.values())
+    meta_b = _build_meta(evts_b.values())
+
+    # a synced UID missing from one window may just have moved out of it
+    found_a, found_b = _run_both(
+        lambda: _confirm_missing(client_a, cal_a, (uid for uid in old_state
+                                                   if uid in meta_b and uid not in meta_a), time_min),
+        lambda: _confirm_missing(client_b, cal_b, (uid for uid in old_state
+                                                   if uid in meta_a and uid not in meta_b), time_min),
+    )
+    meta_a.update(_build_meta(found_a.values()))
+    meta_b.update(_build_meta(found_b.values()))
+
+    # 4) Reconcile: decide every write first, then issue them concurrently
     all_uids = set(old_state) | set(meta_a) | set(meta_b)
     new_state = {}
+    to_delete, to_create, to_update = [], [], []
 
     for uid in all_uids:
         in_a, in_b = uid in meta_a, uid in meta_b
@@ -84,24 +283,22 @@ def sync_caldav_caldav(
         # a) Deleted on one side
         if prev and in_a and not in_b:
             logger.info(f"UID={uid} deleted from B → deleting in A")
-            client_a.delete_event(cal_a, meta_a[uid][1].url)
+            to_delete.append((uid, partial(client_a.delete_event, cal_a, meta_a[uid][1].url)))
             continue
         if prev and in_b and not in_a:
             logger.info(f"UID={uid} deleted from A → deleting in B")
-            client_b.delete_event(cal_b, meta_b[uid][1].url)
+            to_delete.append((uid, partial(client_b.delete_event, cal_b, meta_b[uid][1].url)))
             continue
 
         # b) New on one side
         if not prev and in_a and not in_b:
             logger.info(f"UID={uid} new in A → creating in B")
-            ical = meta_a[uid][1].to_ical()
-            client_b.create_event(cal_b, ical)
+            to_create.append((uid, partial(_copy_event, client_b, cal_b, uid, meta_a[uid][1])))
             new_state[uid] = meta_a[uid][0].isoformat()
             continue
         if not prev and in_b and not in_a:
             logger.info(f"UID={uid} new in B → creating in A")
-            ical = meta_b[uid][1].to_ical()
-            client_a.create_event(cal_a, ical)
+            to_create.append((uid, partial(_copy_event, client_a, cal_a, uid, meta_b[uid][1])))
             new_state[uid] = meta_b[uid][0].isoformat()
             continue
 
@@ -109,13 +306,19 @@ def sync_caldav_caldav(
         if in_a and in_b:
             lm_a, evt_a = meta_a[uid]
             lm_b, evt_b = meta_b[uid]
+            newer = max(lm_a, lm_b)
+            # the newer timestamp is recorded even when the copies turn out to
+            # be identical (see _copy_event), so next run skips the comparison
+            if lm_a != lm_b and old_state.get(uid) == newer.isoformat():
+                new_state[uid] = newer.isoformat()
+                continue
             if lm_a > lm_b:
                 logger.info(f"UID={uid} newer in A ({lm_a}) → updating B ({lm_b})")
-                client_b.update_event(cal_b, evt_b.url, evt_a.to_ical())
+                to_update.append((uid, partial(_copy_event, client_b, cal_b, uid, evt_a, evt_b)))
                 new_state[uid] = lm_a.isoformat()
             elif lm_b > lm_a:
                 logger.info(f"UID={uid} newer in B ({lm_b}) → updating A ({lm_a})")
-                client_a.update_event(cal_a, evt_a.url, evt_b.to_ical())
+                to_update.append((uid, partial(_copy_event, client_a, cal_a, uid, evt_b, evt_a)))
                 new_state[uid] = lm_b.isoformat()
             else:
                 new_state[uid] = lm_a.isoformat()
@@ -123,28 +326,38 @@ def sync_caldav_caldav(
 
         # d) If it’s gone from both, drop it
 
-    # 5) Persist state
-    with open(state_path, "w") as f:
-        json.dump(new_state, f, indent=2)
+    # deletes go first so a re-created UID never collides with its old copy
+    failed = _run_writes(to_delete, to_create + to_update)
 
-    logger.info("Full two‐way sync complete")
+    # a failed write keeps its previous state, so the next run retries it
+    # (dropping a failed delete would make it look "new" and resurrect it)
+    for uid in failed:
+        if uid in old_state:
+            new_state[uid] = old_state[uid]
+        else:
+            new_state.pop(uid, None)
+    if failed:
+        # …and the ctag shortcut mustn't skip that retry
+        sync_a["ctag"] = sync_b["ctag"] = None
 
+    # 5) Persist state (+ sync-tokens for the next incremental fetch)
+    new_state["__sync_a"] = sync_a
+    new_state["__sync_b"] = sync_b
+    save_state(state_path, new_state)
 
-def _parse_dt_range(ical_bytes):
-    cal = ICalendar.from_ical(ical_bytes)
-    for comp in cal.walk():
-        if comp.name == "VEVENT":
-            return comp.get("DTSTART").dt, comp.get("DTEND").dt
-    raise ValueError("No VEVENT for dt parsing")
+    if failed:
+        raise next(iter(failed.values()))
+
+    logger.info("Full two‐way sync complete")
 
 
-def _build_busy_ical(uid: str, dtstart, dtend) -> bytes:
+def _build_busy_ical(uid: str, dtstart, dtend, dtstamp: datetime = None) -> bytes:
     cal = ICalendar()
     cal.add("prodid", "-//busy-sync//")
     cal.add("version", "2.0")
     evt = Event()
     evt.add("uid", uid)
-    evt.add("dtstamp", datetime.now(timezone.utc))
+    evt.add("dtstamp", dtstamp or datetime.now(timezone.utc))
     evt.add("dtstart", dtstart)
     evt.add("dtend", dtend)
     evt.add("summary", "Busy")
@@ -157,64 +370,81 @@ def sync_caldav_busy(
     client_target: CaldavClient,
     cal_name_target: str,
     state_path: str = "busy_sync_state.json",
+    history: timedelta | None = DEFAULT_HISTORY,
 ):
     """
     One-way “busy-only” sync A→B, plus:
       • two-way time-patching of Busy placeholders
       • delete‐on‐B and delete‐on‐A both propagate correctly
+    Only events overlapping the last `history` onwards are considered;
+    history=None syncs everything (incrementally, via sync-tokens).
     """
-
-    # 1) LOAD previous state
-    if os.path.exists(state_path):
-        with open(state_path, "r") as f:
-            data = json.load(f)
-        old_synced     = {uid: datetime.fromisoformat(ts)
-                          for uid, ts in data.get("synced", {}).items()}
-        old_busy       = set(data.get("busy_uids", []))
-        tombstones     = set(data.get("tombstones", []))
-        old_real_uids  = set(data.get("real_uids", []))
-    else:
-        old_synced = {}
-        old_busy = set()
-        tombstones = set()
-        old_real_uids = set()
+    time_min = _since(history)
+    # one DTSTAMP for every placeholder written by this run
+    dtstamp = datetime.now(timezone.utc)
+
+    # 1) LOAD previous state (empty on first run)
+    data = load_state(state_path)
+    old_synced     = data.get("synced", {})
+    old_busy       = set(data.get("busy_uids", []))
+    tombstones     = set(data.get("tombstones", []))
+    old_real_uids  = set(data.get("real_uids", []))
+    sync_a         = data.get("sync_a", {})
+    sync_b         = data.get("sync_b", {})
 
     # 2) LOOK UP calendars
-    cal_src = client_source.get_calendar_by_name(cal_name_source)
-    cal_tgt = client_target.get_calendar_by_name(cal_name_target)
+    cal_src, cal_tgt = _run_both(
+        lambda: client_source.get_calendar_by_name(cal_name_source),
+        lambda: client_target.get_calendar_by_name(cal_name_target),
+    )
     if not cal_src or not cal_tgt:
         raise ValueError(f"Calendars not found: {cal_name_source}, {cal_name_target}")
 
-    # 3) FETCH all events
-    src_events = client_source.fetch_events(cal_src)
-    tgt_events = client_target.fetch_events(cal_tgt)
-
-    # 4a) BUILD src_meta: A → uid → (event_obj, raw_ical, last_mod)
-    src_meta = {}
-    for e in src_events:
-        raw = e.to_ical()
-        uid, lm = _parse_ical_metadata(raw)
-        src_meta[uid] = (e, raw, lm)
+    # 3) FETCH all events (incrementally, via sync-token), unless neither ctag moved
+    ctag_a, ctag_b, unchanged = _fetch_ctags(
+        client_source, cal_src, client_target, cal_tgt, sync_a, sync_b
+    )
+    if unchanged:
+        logger.info("Busy-sync: no changes (ctag)")
+        return
+    # Busy-sync only needs UID, timestamps, SUMMARY and start/end of each
+    # event; full data is downloaded only for an A event that gets patched
+    (src_events, sync_a), (tgt_events, sync_b) = _run_both(
+        lambda: _fetch_side(client_source, cal_src, sync_a, time_min, headers_only=True),
+        lambda: _fetch_side(client_target, cal_tgt, sync_b, time_min, headers_only=True),
+    )
+    sync_a["ctag"], sync_b["ctag"] = ctag_a, ctag_b
+
+    # 4a) BUILD src_meta: A → uid → (last_mod, event_obj)
+    src_meta = _build_meta(src_events.values())
 
     # 4b) BUILD real_meta + busy_meta + current real_uids
-    real_meta = {}
-    busy_meta = {}
-    real_uids = set()
-    for e in tgt_events:
-        raw = e.to_ical()
-        uid, lm = _parse_ical_metadata(raw)
-        if _get_summary(raw) != "Busy":
-            real_uids.add(uid)
-            real_meta[uid] = (e, raw, lm)
-        else:
-            busy_meta[uid] = (e, raw, lm)
+    tgt_meta = _build_meta(tgt_events.values())
+
+    # a UID we'd treat as deleted on one side because it's missing from that
+    # window may just lie outside it (moved, or a recurring series whose
+    # placeholder only covers the first occurrence): confirm by UID first
+    missing_src = {uid for uid in old_real_uids | set(old_synced)
+                   if uid in tgt_meta and uid not in src_meta}
+    missing_tgt = {uid for uid in old_real_uids | old_busy
+                   if uid in src_meta and uid not in tgt_meta}
+    found_src, found_tgt = _run_both(
+        lambda: _confirm_missing(client_source, cal_src, missing_src, time_min),
+        lambda: _confirm_missing(client_target, cal_tgt, missing_tgt, time_min),
+    )
+    src_meta.update(_build_meta(found_src.values()))
+    tgt_meta.update(_build_meta(found_tgt.values()))
+
+    real_meta = {uid: m for uid, m in tgt_meta.items() if m[1].meta.summary != "Busy"}
+    busy_meta = {uid: m for uid, m in tgt_meta.items() if m[1].meta.summary == "Busy"}
+    real_uids = set(real_meta)
 
     # ─── NEW BLOCK ─── propagate deletions _on A_ for real B-events ─────────────
     # If a UID was a real B-event last run, but no longer in A, delete it in B.
     deleted_on_a = old_real_uids - set(src_meta.keys())
     for uid in deleted_on_a:
         if uid in real_meta:
-            e_tgt, _, _ = real_meta[uid]
+            _, e_tgt = real_meta[uid]
             client_target.delete_event(cal_tgt, e_tgt.url)
         tombstones.add(uid)
     # ────────────────────────────────────────────────────────────────────────────
@@ -223,7 +453,7 @@ def sync_caldav_busy(
     deleted_real = old_real_uids - real_uids
     for uid in deleted_real:
         if uid in src_meta:
-            e_src, _, _ = src_meta.pop(uid)
+            _, e_src = src_meta.pop(uid)
             client_source.delete_event(cal_src, e_src.url)
         tombstones.add(uid)
 
@@ -231,7 +461,7 @@ def sync_caldav_busy(
     deleted_busy = old_busy - set(busy_meta.keys())
     for uid in deleted_busy:
         if uid in src_meta:
-            e_src, _, _ = src_meta.pop(uid)
+            _, e_src = src_meta.pop(uid)
             client_source.delete_event(cal_src, e_src.url)
         tombstones.add(uid)
 
@@ -239,8 +469,9 @@ def sync_caldav_busy(
     all_uids   = set(old_synced) | set(src_meta) | set(busy_meta)
     new_synced = {}
     new_busy   = set()
+    failed     = False
 
-    for uid in sorted(all_uids):
+    for uid in all_uids:
         in_src  = uid in src_meta
         in_busy = uid in busy_meta
 
@@ -250,7 +481,7 @@ def sync_caldav_busy(
 
         # deletion upstream in A → delete Busy placeholder in B
         if uid in old_synced and not in_src and in_busy:
-            e_tgt, _, _ = busy_meta[uid]
+            _, e_tgt = busy_meta[uid]
             client_target.delete_event(cal_tgt, e_tgt.url)
             tombstones.discard(uid)
             continue
@@ -259,38 +490,39 @@ def sync_caldav_busy(
         if in_src and not in_busy:
             if uid in tombstones:
                 continue
-            _, raw_src, lm_src = src_meta[uid]
-            dtstart, dtend = _parse_dt_range(raw_src)
-            busy_ical = _build_busy_ical(uid, dtstart, dtend)
+            lm_src, e_src = src_meta[uid]
+            dtstart, dtend = e_src.dt_range
+            busy_ical = _build_busy_ical(uid, dtstart, dtend, dtstamp=dtstamp)
             try:
-                client_target.create_event(cal_tgt, busy_ical)
-            except PutError:
-                # collision → fallback
-                for e in tgt_events:
-                    if _parse_ical_metadata(e.to_ical())[0] == uid:
-                        client_target.update_event(cal_tgt, e.url, busy_ical)
-                        break
+                # collision with a copy outside the window → overwrite it
+                _create_or_update(client_target, cal_tgt, uid, busy_ical)
+            except PutError as e:
+                # not recorded, so next run retries instead of taking the
+                # missing placeholder for a deletion on B
+                logger.error(f"UID={uid} could not create Busy placeholder: {e}")
+                failed = True
+                continue
             new_synced[uid] = lm_src.isoformat()
             new_busy.add(uid)
             continue
 
         # both exist → two-way timestamp compare
         if in_src and in_busy:
-            e_src, raw_src, lm_src = src_meta[uid]
-            e_tgt, raw_tgt, lm_tgt = busy_meta[uid]
+            lm_src, e_src = src_meta[uid]
+            lm_tgt, e_tgt = busy_meta[uid]
 
             if lm_src > lm_tgt:
                 # A moved/rescheduled → update Busy in B
-                dtstart, dtend = _parse_dt_range(raw_src)
-                busy_ical = _build_busy_ical(uid, dtstart, dtend)
+                dtstart, dtend = e_src.dt_range
+                busy_ical = _build_busy_ical(uid, dtstart, dtend, dtstamp=dtstamp)
                 client_target.update_event(cal_tgt, e_tgt.url, busy_ical)
                 new_synced[uid] = lm_src.isoformat()
                 new_busy.add(uid)
 
             elif lm_tgt > lm_src:
                 # Busy moved on B → patch A event
-                dtstart, dtend = _parse_dt_range(raw_tgt)
-                updated = _update_src_ical(raw_src, dtstart, dtend)
+                dtstart, dtend = e_tgt.dt_range
+                updated = _update_src_ical(e_src.ical, dtstart, dtend)
                 client_source.update_event(cal_src, e_src.url, updated)
                 new_synced[uid] = lm_tgt.isoformat()
                 new_busy.add(uid)
@@ -304,32 +536,39 @@ def sync_caldav_busy(
 
         # else: fully gone → drop
 
+    # the ctag shortcut mustn't skip the retry of a failed placeholder
+    if failed:
+        sync_a["ctag"] = sync_b["ctag"] = None
+
     # 8) PERSIST new state
-    with open(state_path, "w") as f:
-        json.dump({
-            "synced":    new_synced,
-            "busy_uids": list(new_busy),
-            "tombstones": list(tombstones),
-            "real_uids": list(real_uids),
-        }, f, indent=2)
+    save_state(state_path, {
+        "synced":    new_synced,
+        "busy_uids": list(new_busy),
+        "tombstones": list(tombstones),
+        "real_uids": list(real_uids),
+        "sync_a":    sync_a,
+        "sync_b":    sync_b,
+    })
 
     logger.info("Busy-sync complete")
 
 # — Helpers for SUMMARY & in-place patch of DTSTART/DTEND —
 
-def _get_summary(raw_ical: bytes) -> str:
-    cal = ICalendar.from_ical(raw_ical)
-    for comp in cal.walk():
-        if comp.name == "VEVENT":
-            return comp.get("SUMMARY")
-    return ""
-
 def _update_src_ical(raw: bytes, new_start: datetime, new_end: datetime) -> bytes:
+    # fast path: patch the DTSTART/DTEND lines in place
+    updated = rewrite_dt_range(raw, new_start, new_end)
+    if updated is not None:
+        return updated
     cal = ICalendar.from_ical(raw)
     for comp in cal.walk():
         if comp.name == "VEVENT":
             comp["DTSTART"].dt = new_start
-            comp["DTEND"].dt   = new_end
+            if "DTEND" in comp:
+                comp["DTEND"].dt = new_end
+            else:
+                # DURATION-based (or open-ended) event: keep the new length
+                comp.pop("DURATION", None)
+                comp.add("dtend", new_end)
     return cal.to_ical()
 
 def sync_caldav_full_oneway(
@@ -338,55 +577,64 @@ def sync_caldav_full_oneway(
     client_target: CaldavClient,
     cal_name_target: str,
     state_path: str = "full_sync_state.json",
+    history: timedelta | None = DEFAULT_HISTORY,
 ):
     """
     One-way full sync from source → target, skipping SUMMARY="Busy" and
     never deleting A-only events that it didn’t create.
+    Only events overlapping the last `history` onwards are considered;
+    history=None syncs everything (incrementally, via sync-tokens).
 
     Internally versioned: if state_path exists but isn’t marked for
     'full_oneway', it will be ignored (treat as first run).
     """
+    time_min = _since(history)
     # 1) Load previous state *only* if it was created by full_oneway
     old_state = {}
+    sync_a = {}
+    sync_b = {}
     if os.path.exists(state_path):
         try:
-            data = json.load(open(state_path, "r"))
+            data = load_state(state_path)
             if data.get("__mode") == "full_oneway":
-                for uid, ts in data.items():
-                    if uid == "__mode":
-                        continue
-                    old_state[uid] = datetime.fromisoformat(ts)
+                sync_a = data.get("__sync_a", {})
+                sync_b = data.get("__sync_b", {})
+                old_state = {uid: ts for uid, ts in data.items()
+                             if not uid.startswith("__")}
             else:
                 logger.info("Ignoring mismatched state file (not full_oneway mode)")
         except Exception as e:
             logger.warning(f"Could not read full_oneway state, starting fresh: {e}")
 
     # 2) Lookup calendars
-    cal_src = client_source.get_calendar_by_name(cal_name_source)
-    cal_tgt = client_target.get_calendar_by_name(cal_name_target)
+    cal_src, cal_tgt = _run_both(
+        lambda: client_source.get_calendar_by_name(cal_name_source),
+        lambda: client_target.get_calendar_by_name(cal_name_target),
+    )
     if not cal_src or not cal_tgt:
         raise ValueError(f"Calendars not found: {cal_name_source}, {cal_name_target}")
 
-    # 3) Fetch events
-    src_events = client_source.fetch_events(cal_src)
-    tgt_events = client_target.fetch_events(cal_tgt)
+    # 3) Fetch events (incrementally, via sync-token), unless neither ctag moved
+    ctag_a, ctag_b, unchanged = _fetch_ctags(
+        client_source, cal_src, client_target, cal_tgt, sync_a, sync_b
+    )
+    if unchanged:
+        logger.info("Full one‐way sync: no changes (ctag)")
+        return
+    (src_events, sync_a), (tgt_events, sync_b) = _run_both(
+        lambda: _fetch_side(client_source, cal_src, sync_a, time_min),
+        lambda: _fetch_side(client_target, cal_tgt, sync_b, time_min),
+    )
+    sync_a["ctag"], sync_b["ctag"] = ctag_a, ctag_b
 
     # 4) Build metadata (skip Busy)
-    meta_src = {}
-    for e in src_events:
-        raw = e.to_ical()
-        cal = ICalendar.from_ical(raw)
-        summ = next((c.get("SUMMARY") for c in cal.walk() if c.name=="VEVENT"), None)
-        if summ == "Busy":
-            continue
-        uid, lm = _parse_ical_metadata(raw)
-        meta_src[uid] = (lm, raw)
+    meta_src = _build_meta(src_events.values(), skip_busy=True)
+    meta_tgt = _build_meta(tgt_events.values())
 
-    meta_tgt = {}
-    for e in tgt_events:
-        raw = e.to_ical()
-        uid, lm = _parse_ical_metadata(raw)
-        meta_tgt[uid] = (lm, e)
+    # a synced UID missing from the source window may just have moved out of it
+    found = _confirm_missing(client_source, cal_src, (uid for uid in old_state
+                                                      if uid in meta_tgt and uid not in meta_src), time_min)
+    meta_src.update(_build_meta(found.values(), skip_busy=True))
 
     # 5) Reconcile one-way: create/update from src → tgt, and only delete
     #    events that we *know* we created (i.e. those in old_state).
@@ -407,19 +655,19 @@ def sync_caldav_full_oneway(
 
         # b) new in src → create in tgt
         if in_src and not in_tgt:
-            lm, raw = meta_src[uid]
+            lm, se = meta_src[uid]
             logger.info(f"[full_oneway] Creating {uid} in target")
-            client_target.create_event(cal_tgt, raw)
+            _create_or_update(client_target, cal_tgt, uid, se.ical)
             new_state[uid] = lm.isoformat()
             continue
 
         # c) update in src → overwrite in tgt
         if in_src and in_tgt:
-            lm_src, raw = meta_src[uid]
+            lm_src, se = meta_src[uid]
             lm_tgt, te = meta_tgt[uid]
             if lm_src > lm_tgt:
                 logger.info(f"[full_oneway] Updating {uid} in target")
-                client_target.update_event(cal_tgt, te.url, raw)
+                client_target.update_event(cal_tgt, te.url, se.ical)
                 new_state[uid] = lm_src.isoformat()
             else:
                 new_state[uid] = lm_tgt.isoformat()
@@ -429,9 +677,8 @@ def sync_caldav_full_oneway(
         # and we don't include it in new_state
 
     # 6) Persist versioned state
-    to_save = {"__mode": "full_oneway"}
+    to_save = {"__mode": "full_oneway", "__sync_a": sync_a, "__sync_b": sync_b}
     to_save.update(new_state)
-    with open(state_path, "w") as f:
-        json.dump(to_save, f, indent=2)
+    save_state(state_path, to_save)
 
     logger.info("Full one‐way sync complete (skipped Busy, preserved A‐only)")
@@ -0,0 +1,92 @@
+# tests/test_caldav_client.py
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from src.caldav_client import POOL_SIZE, CaldavClient
+
+
+@pytest.mark.parametrize("http_lib", ["requests", "niquests"])
+def test_tune_session_pools_and_retries(http_lib):
+    session = pytest.importorskip(http_lib).Session()
+    CaldavClient._tune_session(session)
+    for prefix in ("https://", "http://"):
+        adapter = session.adapters[prefix]
+        assert adapter._pool_maxsize == POOL_SIZE
+        assert adapter.max_retries.total == 3
+        assert set(adapter.max_retries.status_forcelist) == {502, 503, 504}
+        assert {"PROPFIND", "REPORT"} <= set(adapter.max_retries.allowed_methods)
+
+
+def test_dav_client_session_is_tuned():
+    client = CaldavClient("https://dav.example.invalid/", "user", "secret")
+    assert client.client.session.adapters["https://"]._pool_maxsize == POOL_SIZE
+
+
+class RecordingCalendar:
+    def __init__(self):
+        self.searches, self.multigets = [], []
+
+    def search(self, start=None, end=None, **kw):
+        self.searches.append((start, end))
+        return []
+
+    def multiget(self, hrefs):
+        self.multigets.append(list(hrefs))
+        return []
+
+
+def test_iter_events_bounds_future_windows():
+    cal = RecordingCalendar()
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    client = CaldavClient.__new__(CaldavClient)
+    list(client.iter_events(cal, start, chunk_months=6, horizon_months=24))
+
+    # contiguous 6-month windows up to two years ahead, then one open-ended tail
+    assert cal.searches[0][0] == start
+    for (_, end), (next_start, _) in zip(cal.searches, cal.searches[1:]):
+        assert end == next_start
+    *bounded, (tail_start, tail_end) = cal.searches
+    assert len(bounded) == 5 and all(end is not None for _, end in bounded)
+    assert tail_end is None
+    assert tail_start >= datetime.now(timezone.utc) + relativedelta(months=24)
+
+
+def test_iter_events_by_href_batches():
+    cal = RecordingCalendar()
+    client = CaldavClient.__new__(CaldavClient)
+    list(client.iter_events_by_href(cal, [f"/{i}.ics" for i in range(250)], batch_size=100))
+    assert [len(batch) for batch in cal.multigets] == [100, 100, 50]
+
+
+class FakeTokenCalendar:
+    def __init__(self, token, data):
+        self.token, self.data = token, data
+
+    def objects_by_sync_token(self, sync_token=None, load_objects=False):
+        class Obj:
+            url, data = "/1.ics", self.data
+
+        class Collection:
+            objects, sync_token = [Obj()], self.token
+
+        return Collection()
+
+
+EVENT = (b"BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:u1\r\nDTSTAMP:20260101T000000Z\r\n"
+         b"DTSTART:20260105T100000Z\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n")
+
+
+def test_fetch_events_fake_sync_token_is_a_full_listing():
+    client = CaldavClient.__new__(CaldavClient)
+    events, deleted, token = client.fetch_events(FakeTokenCalendar("fake-42", EVENT), sync_token="fake-41")
+    assert [e.meta.uid for e in events] == ["u1"]
+    assert deleted == [] and token is None
+
+
+def test_fetch_events_reports_deleted_hrefs():
+    client = CaldavClient.__new__(CaldavClient)
+    events, deleted, token = client.fetch_events(FakeTokenCalendar("t2", None), sync_token="t1")
+    assert list(events) == [] and deleted == ["/1.ics"] and token == "t2"
@@ -0,0 +1,226 @@
+# tests/test_ical.py
+
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from src.ical import (
+    content_hash,
+    get_summary,
+    parse_dt_range,
+    rewrite_dt_range,
+    scan_ical_headers,
+)
+
+
+def make_ical(*event_lines, prefix=(), prodid="-//test//"):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{prodid}", *prefix,
+             "BEGIN:VEVENT", *event_lines, "END:VEVENT", "END:VCALENDAR"]
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+BERLIN = [
+    "BEGIN:VTIMEZONE", "TZID:Europe/Berlin",
+    "BEGIN:STANDARD", "DTSTART:19701025T030000", "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100", "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU", "END:STANDARD",
+    "BEGIN:DAYLIGHT", "DTSTART:19700329T020000", "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200", "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU", "END:DAYLIGHT",
+    "END:VTIMEZONE",
+]
+
+
+# ─── scan_ical_headers / get_summary ────────────────────────────────────────
+
+def test_scan_unfolds_folded_lines():
+    raw = make_ical("UID:abc", " def", "SUMMARY:Long", "\tmeeting", "DTSTART:20260105T100000Z")
+    headers = scan_ical_headers(raw)
+    assert headers["UID"] == ("", "abcdef")
+    assert headers["SUMMARY"] == ("", "Longmeeting")
+
+
+def test_scan_ignores_nested_valarm_properties():
+    raw = make_ical(
+        "UID:abc",
+        "BEGIN:VALARM", "ACTION:DISPLAY", "SUMMARY:Reminder", "TRIGGER:-PT5M", "END:VALARM",
+        "SUMMARY:Meeting",
+    )
+    assert scan_ical_headers(raw)["SUMMARY"] == ("", "Meeting")
+
+
+def test_scan_valarm_summary_only_means_no_summary():
+    raw = make_ical(
+        "UID:abc",
+        "BEGIN:VALARM", "ACTION:DISPLAY", "SUMMARY:Reminder", "TRIGGER:-PT5M", "END:VALARM",
+    )
+    assert "SUMMARY" not in scan_ical_headers(raw)
+    assert get_summary(raw) is None
+
+
+def test_scan_keeps_params():
+    raw = make_ical("UID:abc", "DTSTART;TZID=Europe/Berlin:20260105T100000")
+    assert scan_ical_headers(raw)["DTSTART"] == (";TZID=Europe/Berlin", "20260105T100000")
+
+
+def test_scan_without_vevent():
+    assert scan_ical_headers(b"BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n") == {}
+    assert get_summary(b"BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n") == ""
+
+
+def test_get_summary_unescapes_text():
+    raw = make_ical("UID:abc", r"SUMMARY:Lunch\, then 1\;1\nwith Bob \\o/")
+    assert get_summary(raw) == "Lunch, then 1;1\nwith Bob \\o/"
+
+
+def test_get_summary_busy():
+    assert get_summary(make_ical("UID:abc", "SUMMARY:Busy")) == "Busy"
+
+
+# ─── parse_dt_range ─────────────────────────────────────────────────────────
+
+def test_dt_range_utc():
+    raw = make_ical("UID:abc", "DTSTART:20260105T100000Z", "DTEND:20260105T110000Z")
+    assert parse_dt_range(raw) == (
+        datetime(2026, 1, 5, 10, tzinfo=timezone.utc),
+        datetime(2026, 1, 5, 11, tzinfo=timezone.utc),
+    )
+
+
+def test_dt_range_tzid():
+    raw = make_ical(
+        "UID:abc",
+        "DTSTART;TZID=Europe/Berlin:20260105T100000",
+        "DTEND;TZID=Europe/Berlin:20260105T110000",
+        prefix=BERLIN,
+    )
+    dtstart, dtend = parse_dt_range(raw)
+    assert dtstart == datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+    assert dtend - dtstart == timedelta(hours=1)
+
+
+def test_dt_range_all_day():
+    raw = make_ical("UID:abc", "DTSTART;VALUE=DATE:20260105", "DTEND;VALUE=DATE:20260107")
+    assert parse_dt_range(raw) == (date(2026, 1, 5), date(2026, 1, 7))
+
+
+def test_dt_range_duration_instead_of_dtend():
+    raw = make_ical("UID:abc", "DTSTART:20260105T100000Z", "DURATION:PT1H30M")
+    assert parse_dt_range(raw) == (
+        datetime(2026, 1, 5, 10, tzinfo=timezone.utc),
+        datetime(2026, 1, 5, 11, 30, tzinfo=timezone.utc),
+    )
+
+
+def test_dt_range_duration_with_tzid():
+    raw = make_ical("UID:abc", "DTSTART;TZID=Europe/Berlin:20260105T100000",
+                    "DURATION:PT2H", prefix=BERLIN)
+    dtstart, dtend = parse_dt_range(raw)
+    assert dtend - dtstart == timedelta(hours=2)
+
+
+def test_dt_range_missing_dtend_defaults():
+    # RFC 5545 §3.6.1: all-day → one day, timed → zero length
+    all_day = make_ical("UID:abc", "DTSTART;VALUE=DATE:20260105")
+    assert parse_dt_range(all_day) == (date(2026, 1, 5), date(2026, 1, 6))
+    timed = make_ical("UID:abc", "DTSTART:20260105T100000Z")
+    start = datetime(2026, 1, 5, 10, tzinfo=timezone.utc)
+    assert parse_dt_range(timed) == (start, start)
+
+
+def test_dt_range_ignores_valarm_and_later_vevents():
+    raw = make_ical(
+        "UID:abc", "DTSTART:20260105T100000Z", "DTEND:20260105T110000Z",
+        "BEGIN:VALARM", "ACTION:DISPLAY", "TRIGGER:-PT5M", "END:VALARM",
+    ).replace(b"END:VCALENDAR", b"BEGIN:VEVENT\r\nUID:abc\r\nRECURRENCE-ID:20260112T100000Z\r\n"
+                                b"DTSTART:20260112T120000Z\r\nDTEND:20260112T130000Z\r\n"
+                                b"END:VEVENT\r\nEND:VCALENDAR")
+    assert parse_dt_range(raw)[0] == datetime(2026, 1, 5, 10, tzinfo=timezone.utc)
+
+
+# ─── rewrite_dt_range ───────────────────────────────────────────────────────
+
+NEW_START = datetime(2026, 2, 1, 9, tzinfo=timezone.utc)
+NEW_END = datetime(2026, 2, 1, 10, tzinfo=timezone.utc)
+
+
+def test_rewrite_utc_keeps_everything_else():
+    raw = make_ical("UID:abc", "DTSTART:20260105T100000Z", "DTEND:20260105T110000Z",
+                    "DESCRIPTION:keep\\, me", "X-CUSTOM;FOO=bar:baz")
+    out = rewrite_dt_range(raw, NEW_START, NEW_END)
+    expected = raw.replace(b"DTSTART:20260105T100000Z", b"DTSTART:20260201T090000Z") \
+                  .replace(b"DTEND:20260105T110000Z", b"DTEND:20260201T100000Z")
+    assert out == expected
+
+
+def test_rewrite_tzid_converts_into_that_zone():
+    raw = make_ical("UID:abc", "DTSTART;TZID=Europe/Berlin:20260105T100000",
+                    "DTEND;TZID=Europe/Berlin:20260105T110000", prefix=BERLIN)
+    out = rewrite_dt_range(raw, NEW_START, NEW_END)
+    assert b"DTSTART;TZID=Europe/Berlin:20260201T100000\r\n" in out
+    assert b"DTEND;TZID=Europe/Berlin:20260201T110000\r\n" in out
+    # VTIMEZONE DTSTARTs are left alone
+    assert b"DTSTART:19701025T030000" in out
+    assert parse_dt_range(out)[0] == NEW_START.astimezone(ZoneInfo("Europe/Berlin"))
+
+
+def test_rewrite_all_day():
+    raw = make_ical("UID:abc", "DTSTART;VALUE=DATE:20260105", "DTEND;VALUE=DATE:20260106")
+    out = rewrite_dt_range(raw, date(2026, 2, 1), date(2026, 2, 3))
+    assert parse_dt_range(out) == (date(2026, 2, 1), date(2026, 2, 3))
+
+
+def test_rewrite_date_vs_datetime_mismatch():
+    raw = make_ical("UID:abc", "DTSTART;VALUE=DATE:20260105", "DTEND;VALUE=DATE:20260106")
+    assert rewrite_dt_range(raw, NEW_START, NEW_END) is None
+
+
+def test_rewrite_unknown_tzid():
+    raw = make_ical("UID:abc", "DTSTART;TZID=Custom Zone:20260105T100000",
+                    "DTEND;TZID=Custom Zone:20260105T110000")
+    assert rewrite_dt_range(raw, NEW_START, NEW_END) is None
+
+
+def test_rewrite_needs_dtend():
+    assert rewrite_dt_range(make_ical("UID:abc", "DTSTART:20260105T100000Z", "DURATION:PT1H"),
+                            NEW_START, NEW_END) is None
+    assert rewrite_dt_range(make_ical("UID:abc", "DTSTART:20260105T100000Z"),
+                            NEW_START, NEW_END) is None
+
+
+def test_rewrite_folded_value():
+    raw = make_ical("UID:abc",
+                    "DTSTART;VALUE=DATE-TIME;TZID=America/Argentina/ComodRivadavia:20240101T1200",
+                    " 00",
+                    "DTEND;TZID=America/Argentina/ComodRivadavia:20240101T130000")
+    assert parse_dt_range(raw)[0] == datetime(2024, 1, 1, 15, tzinfo=timezone.utc)
+    assert rewrite_dt_range(raw, NEW_START, NEW_END) is None
+
+
+def test_rewrite_without_vevent():
+    assert rewrite_dt_range(b"BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n", NEW_START, NEW_END) is None
+
+
+# ─── content_hash ───────────────────────────────────────────────────────────
+
+def test_hash_ignores_volatile_properties():
+    a = make_ical("UID:abc", "DTSTAMP:20260101T000000Z", "LAST-MODIFIED:20260101T000000Z",
+                  "SUMMARY:Meeting", prodid="-//one//")
+    b = make_ical("UID:abc", "DTSTAMP:20260301T000000Z", "LAST-MODIFIED:20260302T000000Z",
+                  "SUMMARY:Meeting", prodid="-//two//")
+    assert content_hash(a) == content_hash(b)
+
+
+def test_hash_normalizes_folding_and_line_endings():
+    a = make_ical("UID:abc", "SUMMARY:A long meeting")
+    b = make_ical("UID:abc", "SUMMARY:A long", "  meeting").replace(b"\r\n", b"\n")
+    assert content_hash(a) == content_hash(b)
+
+
+def test_hash_sees_real_changes():
+    a = make_ical("UID:abc", "SUMMARY:Meeting", "DTSTART:20260105T100000Z")
+    assert content_hash(a) != content_hash(a.replace(b"Meeting", b"Meeting!"))
+    assert content_hash(a) != content_hash(a.replace(b"T100000Z", b"T110000Z"))
+
+
+def test_hash_accepts_str():
+    raw = make_ical("UID:abc", "SUMMARY:Meeting")
+    assert content_hash(raw.decode()) == content_hash(raw)
+    assert len(content_hash(raw)) == 16
@@ -0,0 +1,444 @@
+# tests/test_sync.py
+
+import re
+import threading
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+from caldav.lib.error import NotFoundError, PutError
+
+from src.caldav_client import CaldavClient
+from src.ical import as_utc, parse_dt_range, scan_ical_headers
+from src.state import load_state
+from src.sync import sync_caldav_busy, sync_caldav_caldav, sync_caldav_full_oneway
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+_PARTIAL_PROPS = (b"BEGIN", b"END", b"VERSION", b"UID", b"DTSTAMP", b"LAST-MODIFIED",
+                  b"SUMMARY", b"DTSTART", b"DTEND", b"DURATION")
+
+
+def stamp(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def make_event(uid, start, summary="Meeting", lm=None, extra=(), end=None):
+    lm = lm or NOW - timedelta(days=60)
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//test//", "BEGIN:VEVENT",
+             f"UID:{uid}", f"DTSTAMP:{stamp(lm)}", f"LAST-MODIFIED:{stamp(lm)}",
+             f"DTSTART:{stamp(start)}", *extra, f"SUMMARY:{summary}", "END:VEVENT", "END:VCALENDAR"]
+    if end is not False:
+        lines.insert(8, f"DTEND:{stamp(end or start + timedelta(hours=1))}")
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def _utc(value):
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    return as_utc(value)
+
+
+class FakeObject:
+    def __init__(self, calendar, url, data):
+        self.calendar, self.url, self.data = calendar, url, data
+
+    def load(self):
+        if self.url not in self.calendar.items:
+            raise NotFoundError(self.url)
+        self.data = self.calendar.items[self.url]
+        return self
+
+    def save(self):
+        self.calendar.put(self.url, self.data)
+
+    def delete(self):
+        self.calendar.remove(self.url)
+
+
+class FakeCalendar:
+    """In-memory CalDAV calendar with time-range searches and unique UIDs."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = {}
+        self.version = 0
+        self.calls = []
+        self.main_thread_gets = 0
+        self._next = 0
+
+    # helpers for the tests
+    def put(self, url, data):
+        self.version += 1
+        self.items[url] = data
+
+    def remove(self, url):
+        self.version += 1
+        del self.items[url]
+
+    def add(self, data):
+        self._next += 1
+        url = f"https://dav/{self.name}/{self._next}.ics"
+        self.put(url, data)
+        return url
+
+    def by_uid(self):
+        return {scan_ical_headers(d)["UID"][1]: d for d in self.items.values()}
+
+    def _overlaps(self, data, start):
+        if b"RRULE:" in data:
+            return True
+        return _utc(parse_dt_range(data)[1]) > start
+
+    # python-caldav API
+    def get_property(self, prop):
+        return str(self.version)
+
+    def search(self, start=None, end=None, xml=None, **kw):
+        self.calls.append("search")
+        since = None
+        if xml is not None:
+            starts = re.findall(r'time-range start="(\w+)"', xml)
+            start = datetime.strptime(starts[0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            if "prop-filter" in xml:
+                since = datetime.strptime(starts[1], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        found = []
+        for url, data in self.items.items():
+            if start is not None and not self._overlaps(data, start):
+                continue
+            if end is not None and _utc(parse_dt_range(data)[0]) >= end:
+                continue
+            if since is not None and re.search(rb"LAST-MODIFIED:(\w+)", data).group(1) < stamp(since).encode():
+                continue
+            if xml is not None and "<C:comp " in xml:  # partial calendar-data
+                data = b"\r\n".join(l for l in data.split(b"\r\n") if l.startswith(_PARTIAL_PROPS))
+            found.append(FakeObject(self, url, data))
+        return found
+
+    def objects_by_sync_token(self, sync_token=None, load_objects=False):
+        from caldav.lib.error import ReportError
+        raise ReportError("no sync-collection")
+
+    def object_by_uid(self, uid):
+        self.calls.append("uid")
+        for url, data in self.items.items():
+            if scan_ical_headers(data)["UID"][1] == uid:
+                return FakeObject(self, url, data)
+        raise NotFoundError(uid)
+
+    def event_by_url(self, url):
+        self.calls.append("get")
+        self.main_thread_gets += threading.current_thread() is threading.main_thread()
+        return FakeObject(self, url, None).load()
+
+    def add_event(self, ical):
+        if scan_ical_headers(ical)["UID"][1] in self.by_uid():
+            raise PutError("UID already exists")
+        self.add(ical)
+
+
+class SyncCollection:
+    def __init__(self, objects, sync_token):
+        self.objects, self.sync_token = objects, sync_token
+
+
+class SyncCalendar(FakeCalendar):
+    """FakeCalendar that also supports RFC 6578 sync-tokens and multiget."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.changes = []  # (version, url) of every write
+
+    def put(self, url, data):
+        super().put(url, data)
+        self.changes.append((self.version, url))
+
+    def remove(self, url):
+        super().remove(url)
+        self.changes.append((self.version, url))
+
+    def objects_by_sync_token(self, sync_token=None, load_objects=False):
+        self.calls.append("sync")
+        token = f"token-{self.version}"
+        if sync_token is None:
+            # hrefs only, like a sync-collection REPORT without calendar-data
+            return SyncCollection([FakeObject(self, url, None) for url in self.items], token)
+        since = int(sync_token.removeprefix("token-"))
+        objects = []
+        for url in dict.fromkeys(url for version, url in self.changes if version > since):
+            obj = FakeObject(self, url, None)
+            if load_objects and url in self.items:
+                obj.load()
+            objects.append(obj)
+        return SyncCollection(objects, token)
+
+    def multiget(self, hrefs):
+        self.calls.append("multiget")
+        return [FakeObject(self, url, self.items[url]) for url in hrefs if url in self.items]
+
+
+def make_client(*calendars):
+    client = CaldavClient.__new__(CaldavClient)
+
+    class Principal:
+        def calendars(self):
+            return list(calendars)
+
+    class DAVClient:
+        def principal(self):
+            return Principal()
+
+    client.client = DAVClient()
+    return client
+
+
+@pytest.fixture
+def pair():
+    a, b = FakeCalendar("A"), FakeCalendar("B")
+    return a, make_client(a), b, make_client(b)
+
+
+# ─── two-way sync ───────────────────────────────────────────────────────────
+
+def test_two_way_syncs_and_propagates_deletes(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "state.json")
+    a.add(make_event("u1", NOW + timedelta(days=1)))
+    b.add(make_event("u2", NOW + timedelta(days=2)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert set(a.by_uid()) == set(b.by_uid()) == {"u1", "u2"}
+
+    for url, data in list(b.items.items()):
+        if b"UID:u1" in data:
+            b.remove(url)
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert set(a.by_uid()) == set(b.by_uid()) == {"u2"}
+
+
+def test_two_way_first_run_keeps_only_metadata(pair, tmp_path):
+    a, ca, b, cb = pair
+    for day in range(1, 6):
+        a.add(make_event(f"u{day}", NOW + timedelta(days=day)))
+    b.add(make_event("u1", NOW + timedelta(days=1)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=str(tmp_path / "state.json"))
+    assert set(b.by_uid()) == {f"u{day}" for day in range(1, 6)}
+    # the window's data is dropped after scanning; only the four events
+    # being copied are fetched again, inside the write workers
+    assert a.calls.count("get") == 4
+    assert a.main_thread_gets == 0
+    assert "get" not in b.calls
+
+
+def test_two_way_event_moved_before_window_is_not_deleted(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "state.json")
+    url = a.add(make_event("u1", NOW + timedelta(days=1)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+
+    a.put(url, make_event("u1", NOW - timedelta(days=40), lm=NOW - timedelta(minutes=5)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    # B's copy is kept and follows A's move
+    assert "u1" in b.by_uid()
+    assert stamp(NOW - timedelta(days=40)).encode() in b.by_uid()["u1"]
+
+
+def test_two_way_listing_path_handles_duration_events(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "state.json")
+    a.add(make_event("u1", NOW + timedelta(days=1)))
+    b.add(make_event("u2", NOW + timedelta(days=1)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+
+    # later runs list the window from partial data; DTSTART+DURATION and
+    # DTSTART-only events must neither crash it nor be downloaded early
+    a.add(make_event("d1", NOW + timedelta(days=3), end=False, extra=["DURATION:PT1H"],
+                     lm=NOW - timedelta(days=60)))
+    a.add(make_event("d2", NOW + timedelta(days=4), end=False, lm=NOW - timedelta(days=60)))
+    a.calls.clear()
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert set(b.by_uid()) == {"u1", "u2", "d1", "d2"}
+    assert a.calls.count("get") == 2  # just the two events being copied
+
+    a.calls.clear()
+    b.add(make_event("u3", NOW + timedelta(days=5), lm=NOW))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert "get" not in a.calls
+    assert set(a.by_uid()) == {"u1", "u2", "u3", "d1", "d2"}
+
+
+def test_two_way_restamped_copy_is_not_rewritten(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "state.json")
+    url = a.add(make_event("u1", NOW + timedelta(days=1)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+
+    a.put(url, make_event("u1", NOW + timedelta(days=1), lm=NOW))  # same content
+    version = b.version
+    a.calls.clear()
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert b.version == version
+    assert a.main_thread_gets == 0 and b.main_thread_gets == 0
+
+
+def test_two_way_failed_write_is_retried(pair, tmp_path, monkeypatch):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "state.json")
+    url = a.add(make_event("u1", NOW + timedelta(days=1)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    synced = load_state(state)["u1"]
+
+    a.put(url, make_event("u1", NOW + timedelta(days=2), lm=NOW))
+
+    def unavailable(url, data):
+        raise RuntimeError("503 Service Unavailable")
+
+    monkeypatch.setattr(b, "put", unavailable)
+    with pytest.raises(RuntimeError):
+        sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    # the previous entry is kept and the ctag shortcut disabled…
+    saved = load_state(state)
+    assert saved["u1"] == synced
+    assert saved["__sync_a"]["ctag"] is None and saved["__sync_b"]["ctag"] is None
+
+    # …so the next run retries the update
+    monkeypatch.undo()
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert stamp(NOW + timedelta(days=2)).encode() in b.by_uid()["u1"]
+
+
+def test_two_way_create_collision_updates_existing_copy(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "state.json")
+    # both copies lie before the window, so the UID isn't in the state
+    a.add(make_event("u1", NOW - timedelta(days=40)))
+    url_b = b.add(make_event("u1", NOW - timedelta(days=40)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+
+    b.put(url_b, make_event("u1", NOW + timedelta(days=7), lm=NOW))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state)
+    assert stamp(NOW + timedelta(days=7)).encode() in a.by_uid()["u1"]
+    assert len(a.items) == 1
+
+
+def test_two_way_sync_token_applies_changes_and_deletes(tmp_path):
+    a, b = SyncCalendar("A"), SyncCalendar("B")
+    ca, cb = make_client(a), make_client(b)
+    state = str(tmp_path / "state.json")
+    url = a.add(make_event("u1", NOW - timedelta(days=400)))
+    gone = a.add(make_event("u2", NOW + timedelta(days=1)))
+    b.add(make_event("u3", NOW + timedelta(days=2)))
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state, history=None)
+    assert set(a.by_uid()) == set(b.by_uid()) == {"u1", "u2", "u3"}
+    assert "multiget" in a.calls
+    # token and index describe A as fetched, before u3 was copied into it
+    saved = load_state(state)
+    assert saved["__sync_a"]["token"] == "token-2"
+    assert set(saved["__sync_a"]["index"]) == {url, gone}
+
+    a.put(url, make_event("u1", NOW - timedelta(days=400), "Renamed", lm=NOW))
+    a.remove(gone)
+    a.calls.clear()
+    b.calls.clear()
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state, history=None)
+    # only the changes are fetched; the rest is rebuilt from the index
+    assert "multiget" not in a.calls and "multiget" not in b.calls
+    assert set(a.by_uid()) == set(b.by_uid()) == {"u1", "u3"}
+    assert b"SUMMARY:Renamed" in b.by_uid()["u1"]
+
+    # a third run picks up this run's own writes and settles without writing
+    version_a, version_b = a.version, b.version
+    sync_caldav_caldav(ca, "A", cb, "B", state_path=state, history=None)
+    assert (a.version, b.version) == (version_a, version_b)
+    saved = load_state(state)
+    assert set(saved["__sync_a"]["index"]) == set(a.items)
+    assert set(saved["__sync_b"]["index"]) == set(b.items)
+
+
+# ─── busy-sync ──────────────────────────────────────────────────────────────
+
+def test_busy_placeholder_created_and_patched_back(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "busy.json")
+    a.add(make_event("s1", NOW + timedelta(days=1), "Private", extra=["DESCRIPTION:secret"]))
+    sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+    placeholder = b.by_uid()["s1"]
+    assert b"SUMMARY:Busy" in placeholder and b"secret" not in placeholder
+
+    (url,) = b.items
+    b.put(url, make_event("s1", NOW + timedelta(days=2), "Busy", lm=NOW + timedelta(days=1)))
+    sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+    patched = a.by_uid()["s1"]
+    assert stamp(NOW + timedelta(days=2)).encode() in patched
+    assert b"DESCRIPTION:secret" in patched
+
+
+def test_busy_failed_placeholder_is_retried(pair, tmp_path, monkeypatch):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "busy.json")
+    a.add(make_event("s1", NOW + timedelta(days=1), "Private"))
+    add_event = b.add_event
+
+    def fail_once(ical):
+        monkeypatch.setattr(b, "add_event", add_event)
+        raise PutError("temporarily unavailable")
+
+    monkeypatch.setattr(b, "add_event", fail_once)
+    sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+    assert b.by_uid() == {}
+
+    # nothing changed on either server, yet the next run must not stop at the ctags
+    sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+    assert "s1" in b.by_uid()
+
+
+def test_busy_handles_duration_events(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "busy.json")
+    a.add(make_event("s1", NOW + timedelta(days=1), "Private", end=False, extra=["DURATION:PT2H"]))
+    b.add(make_event("r1", NOW + timedelta(days=1), "Real", end=False, extra=["DURATION:PT1H"]))
+    sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+    assert parse_dt_range(b.by_uid()["s1"]) == (NOW + timedelta(days=1), NOW + timedelta(days=1, hours=2))
+
+
+def test_busy_recurring_event_before_window_is_not_deleted(pair, tmp_path):
+    a, ca, b, cb = pair
+    state, full_state = str(tmp_path / "busy.json"), str(tmp_path / "full.json")
+    # the placeholder only covers the first occurrence, which is out of range
+    a.add(make_event("s1", NOW - timedelta(days=40), "Weekly", extra=["RRULE:FREQ=WEEKLY"]))
+    for _ in range(2):
+        sync_caldav_busy(ca, "A", cb, "B", state_path=state, history=None)
+        sync_caldav_full_oneway(cb, "B", ca, "A", state_path=full_state, history=None)
+    assert "s1" in b.by_uid()
+
+    for _ in range(2):
+        sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+        sync_caldav_full_oneway(cb, "B", ca, "A", state_path=full_state)
+    assert "s1" in a.by_uid()
+    assert "s1" in b.by_uid()
+
+
+def test_busy_rescheduled_into_window_updates_placeholder(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "busy.json")
+    url = a.add(make_event("s1", NOW - timedelta(days=40), "Private"))
+    sync_caldav_busy(ca, "A", cb, "B", state_path=state, history=None)
+    assert "s1" in b.by_uid()
+
+    a.put(url, make_event("s1", NOW + timedelta(days=7), "Private", lm=NOW + timedelta(days=1)))
+    for _ in range(2):
+        sync_caldav_busy(ca, "A", cb, "B", state_path=state)
+    assert "s1" in a.by_uid()
+    assert parse_dt_range(b.by_uid()["s1"])[0] == NOW + timedelta(days=7)
+
+
+# ─── full one-way ───────────────────────────────────────────────────────────
+
+def test_oneway_skips_busy_and_keeps_moved_events(pair, tmp_path):
+    a, ca, b, cb = pair
+    state = str(tmp_path / "full.json")
+    url = b.add(make_event("r1", NOW + timedelta(days=1), "Real"))
+    b.add(make_event("s1", NOW + timedelta(days=1), "Busy"))
+    sync_caldav_full_oneway(cb, "B", ca, "A", state_path=state)
+    assert set(a.by_uid()) == {"r1"}
+
+    b.put(url, make_event("r1", NOW - timedelta(days=40), "Real", lm=NOW))
+    sync_caldav_full_oneway(cb, "B", ca, "A", state_path=state)
+    assert "r1" in a.by_uid()